@@ -1,16 +1,331 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import anthropic
 import os
+import io
+import math
+import html
+import re
+import time
+import hashlib
+import logging
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
 
-def load_data():
+DATA_FILE = 'Cleaned_Matters_OGC.csv'
+# Columnar copy of DATA_FILE, rebuilt whenever the CSV is newer
+PARQUET_FILE = 'Cleaned_Matters_OGC.parquet'
+LAWYER_COLUMNS = ['Attorney', 'Work Email', 'Education', 'Summary and Expertise']
+# Arrow-backed strings keep the .str operations on the roster out of Python objects
+LAWYER_DTYPES = {col: 'string[pyarrow]' for col in LAWYER_COLUMNS}
+
+# Haiku is plenty for ranking a short roster and is the fastest tier; Sonnet
+# can be switched on from the sidebar to compare match quality
+MODEL = os.getenv('CLAUDE_MODEL', 'claude-haiku-4-5')
+SONNET_MODEL = 'claude-sonnet-4-5'
+MAX_TOKENS = 600
+# Most matches Claude returns, which keeps the tool call well inside MAX_TOKENS
+MAX_MATCHES = 5
+
+# How long a successful search is reused for the same query and roster
+RESPONSE_CACHE_TTL = 3600
+
+# Most lawyers Claude sees per query once the roster has been shortlisted
+ROSTER_LIMIT = 25
+
+# Words too generic to say anything about which lawyer fits a query
+QUERY_STOPWORDS = frozenset("""
+help looking need please show someone work lawyer lawyers attorney attorneys
+available experience
+""".split())
+
+SYSTEM_PROMPT = "You are a legal staffing specialist helping to match lawyers with client needs."
+
+# Known experts for each practice area, best first. This is the single source
+# for the guidelines Claude is given and for answering a query that asks
+# about nothing but one area without calling Claude. Names are spelled as in
+# the roster; the pattern should only match wording that means the area.
+KNOWN_EXPERTS = {
+   'Employment Law': {
+       'pattern': re.compile(r'\b(labor (and|&) )?employment( law)?\b', re.IGNORECASE),
+       'experts': [
+           ('Patricia Lantzy', 'Key employment attorney'),
+           ('Margaret J. Scheele', 'Key employment attorney'),
+           ('Sarah Biran', 'Key employment attorney'),
+           ('Lorna Hebert', 'Key employment attorney')
+       ],
+       'caveat': 'no employment lawyer works more than 85 hours per month'
+   },
+   'Corporate Formation': {
+       'pattern': re.compile(r'\b(corporate|entity|company|business) formation\b', re.IGNORECASE),
+       'experts': [
+           ('Kristin Kreuder', 'Key corporate formation expert'),
+           ('Michael Mendelson', 'Key corporate formation expert'),
+           ('Bruce Friedman', 'Key corporate formation expert'),
+           ('Leonard J. McGill', 'Key corporate formation expert'),
+           ('Nicole J. Desharnais', 'Key corporate formation expert'),
+           ('Chandana Rao', 'Key corporate formation expert'),
+           ('Caroline McCaffery', 'Key corporate formation expert'),
+           ('Susan M. N. Antonio', 'Corporate formation expertise, but limited availability')
+       ]
+   },
+   'Trademarks': {
+       'pattern': re.compile(r'\btrademarks?\b', re.IGNORECASE),
+       'experts': [
+           ('Wade Savoy', 'Primary trademark expert'),
+           ('Michelle Rosenberg', 'Primary trademark expert'),
+           ('Jessica Davis', 'Primary trademark expert')
+       ]
+   },
+   'HIPAA & BAAs': {
+       'pattern': re.compile(r'\bhipaa\b|\bbaas?\b|\bbusiness associate agreements?\b', re.IGNORECASE),
+       'experts': [
+           ('Holly Little', 'Core HIPAA and BAA expert'),
+           ('Bob Michitarian', 'Core HIPAA and BAA expert'),
+           ('Mark Feingold', 'Core HIPAA and BAA expert'),
+           ('Michael Brown', 'Core HIPAA and BAA expert'),
+           ('Martin Lipman', 'Core HIPAA and BAA expert'),
+           ('Fritz Backus', 'Limited HIPAA experience'),
+           ('Ray Sczudlo', 'Limited HIPAA experience')
+       ],
+       'not_experts': [
+           ('Brian Heller', 'has NO HIPAA experience')
+       ]
+   },
+   'FDA/Pharma': {
+       'pattern': re.compile(r'\bfda\b|\bpharma(ceutical)?s?\b', re.IGNORECASE),
+       'experts': [
+           ('Mark Mansour', 'Primary FDA/pharma expert'),
+           ('Berry Flynn Cappucci', 'FDA/pharma expert'),
+           ('Jordan Karp', 'FDA/pharma expert'),
+           ('Holly Little', 'FDA/pharma expert'),
+           ('Elizabeth Smith', 'Limited FDA/pharma experience')
+       ]
+   },
+   'Data Privacy': {
+       'pattern': re.compile(r'\b(data )?privacy\b|\bcyber ?security\b', re.IGNORECASE),
+       'experts': [
+           ('Caroline McCaffery', 'Data privacy expert'),
+           ('Mark Johnson', 'Data privacy expert'),
+           ('Lori S. Ross', 'Data privacy expert'),
+           ('Stephan Grynwajc', 'Data privacy expert'),
+           ('Lakshmi Sarma Ramani', 'Data privacy expert')
+       ]
+   },
+   'Real Estate': {
+       'pattern': re.compile(r'\b(commercial )?real estate\b', re.IGNORECASE),
+       'experts': [
+           ('Josh Miller', 'Real estate expert, including commercial'),
+           ('James Duberman', 'Real estate expert, including commercial'),
+           ('Michael Plantamura', 'Real estate expert, including commercial')
+       ]
+   },
+   'Social Media/Influencer': {
+       'pattern': re.compile(r'\bsocial media\b|\binfluencers?\b', re.IGNORECASE),
+       'experts': [
+           ('Stacey Heller', 'Social media and influencer expert'),
+           ('Chandana Rao', 'Social media and influencer expert'),
+           ('Joseph Tedeschi', 'Social media and influencer expert'),
+           ('Bruce Friedman', 'Social media and influencer expert'),
+           ('Ted Stern', 'Social media and influencer expert'),
+           ('Bradford C. Auerbach', 'Social media and influencer expert')
+       ]
+   },
+   'Satellite/Aerospace': {
+       'pattern': re.compile(r'\bsatellites?\b|\baerospace\b', re.IGNORECASE),
+       'experts': [
+           ('Michael Mendelson', 'Satellite and aerospace expert'),
+           ('Don Levy', 'Satellite and aerospace expert'),
+           ('Donnellda Rice', 'Satellite and aerospace expert'),
+           ('Ron Jarvis', 'Satellite and aerospace expert')
+       ]
+   },
+   'Donor-Advised Funds': {
+       'pattern': re.compile(r'\bdafs?\b|\bdonor.advised funds?\b', re.IGNORECASE),
+       'experts': [
+           ('Anita Drummond', 'Donor-advised fund expert'),
+           ('Lakshmi Sarma Ramani', 'Donor-advised fund expert')
+       ]
+   },
+   'Content/Media Licensing': {
+       'pattern': re.compile(r'\b(content|media) licensing\b', re.IGNORECASE),
+       'experts': [
+           ('Ted Stern', 'Content and media licensing expert'),
+           ('Brian Heller', 'Content and media licensing expert'),
+           ('Joseph Tedeschi', 'Content and media licensing expert'),
+           ('Chandana Rao', 'Content and media licensing expert'),
+           ('Andy Friedman', 'Content and media licensing expert')
+       ]
+   },
+   'Equity Compensation': {
+       'pattern': re.compile(r'\bequity compensation\b|\bstock options?\b', re.IGNORECASE),
+       'experts': [
+           ('Nicole J. Desharnais', 'Equity compensation expert'),
+           ('Leonard J. McGill', 'Equity compensation expert'),
+           ('Don Levy', 'Equity compensation expert')
+       ]
+   },
+   'Retail Industry': {
+       'pattern': re.compile(r'\bretail( industry)?\b', re.IGNORECASE),
+       'experts': [
+           ('Stacey Heller', 'Big-box retail experience'),
+           ('Billie Munro Audia', 'Big-box retail experience'),
+           ('Chandana Rao', 'Fashion retail experience')
+       ]
+   }
+}
+
+# Words that can surround an area without changing what is asked, so "Who can
+# help with trademark work?" still asks about nothing but trademarks. Only
+# words listed here are ignored; anything else, such as a negation or "least",
+# sends the query to Claude.
+AREA_FILLER_WORDS = QUERY_STOPWORDS | frozenset("""
+a an the and or i me my we us our you who can could would will find get to
+for with in on about of is are do does any anyone one recommend
+law legal agreement agreements plan plans matter matters issue issues
+question questions advice counsel
+""".split())
+
+# Example queries based on common requests, shown as buttons
+EXAMPLE_QUERIES = [
+   "Show me an available employment attorney",
+   "Who can help with HIPAA and BAAs?",
+   "I need a lawyer for trademark work",
+   "Looking for someone with FDA and pharmaceutical experience",
+   "Need help with data privacy and cybersecurity",
+   "Who can help with social media and influencer agreements?",
+   "Looking for a commercial real estate lawyer",
+   "Need help with equity compensation plans"
+]
+
+# Queries that name one area but ask something else about it, which only
+# Claude can answer
+CLAUDE_ONLY_QUERIES = [
+   "Who cannot help with trademarks?",
+   "Who has the least trademark experience?",
+   "Who has less HIPAA experience",
+   "Show me an employment lawyer other than Patricia Lantzy",
+   "Anyone besides the usual HIPAA experts?",
+   "Need a privacy lawyer who is not busy",
+   "employment-based visa",
+   "HIPAA compliance for a health app"
+]
+
+def format_guidelines(known_experts):
+   """Render the known experts as the guidelines Claude matches by"""
+   sections = []
+   for area, known in known_experts.items():
+       lines = [f"{area}:"]
+       lines += [f"  - {name}: {reason}" for name, reason in known['experts']]
+       lines += [f"  - Do not recommend {name}, who {reason}" for name, reason in known.get('not_experts', [])]
+       if 'caveat' in known:
+           lines.append(f"  - Note: {known['caveat']}")
+       sections.append("\n".join(lines))
+   return (
+       "Please analyze the lawyers' profiles and recommend matches based on these "
+       "known experts for each practice area:\n\n" + "\n\n".join(sections) +
+       f"\n\nReturn at most {MAX_MATCHES} matches by calling the return_matches tool, best match first."
+   )
+
+MATCHING_GUIDELINES = format_guidelines(KNOWN_EXPERTS)
+
+# Forcing this tool gets the matches back as structured JSON, so there is no
+# free-text format for Claude to drift from or for us to parse
+MATCHES_TOOL = {
+   "name": "return_matches",
+   "description": "Return the recommended lawyers for the client need, ranked best first.",
+   "input_schema": {
+       "type": "object",
+       "properties": {
+           "matches": {
+               "type": "array",
+               "maxItems": MAX_MATCHES,
+               "items": {
+                   "type": "object",
+                   "properties": {
+                       "rank": {"type": "integer"},
+                       "name": {"type": "string", "description": "Attorney name as listed in the roster"},
+                       "key_expertise": {"type": "string", "description": "Relevant expertise for this query"},
+                       "reason": {
+                           "type": "string",
+                           "description": "Why this lawyer is appropriate, including any caveats or limitations"
+                       }
+                   },
+                   "required": ["rank", "name", "key_expertise", "reason"]
+               }
+           }
+       },
+       "required": ["matches"]
+   }
+}
+
+CARDS_PER_PAGE = 30
+
+CARD_STYLE = """<style>
+.lawyer-cards {display: grid; grid-template-columns: repeat(3, minmax(0, 1fr)); gap: 0.75rem; align-items: start;}
+.lawyer-cards details {border: 1px solid rgba(49, 51, 63, 0.2); border-radius: 0.5rem; padding: 0.5rem 0.75rem;}
+.lawyer-cards summary {cursor: pointer;}
+.lawyer-cards ul {list-style: "• "; margin-bottom: 0;}
+</style>"""
+
+MATCH_COLUMNS = {
+   'rank': 'Rank',
+   'name': 'Name',
+   'key_expertise': 'Key Expertise',
+   'reason': 'Recommendation Reason'
+}
+
+@st.cache_data(show_spinner=False)
+def load_data(data_version=None):
+   """Load the cleaned lawyer roster, sorted by name, with precomputed columns
+
+   Cached across reruns; pass the CSV's modification time as data_version
+   so an updated file is picked up without restarting the app.
+   """
+   df = read_roster()
+   
+   # Drop lawyers whose essential information is NA or empty here, once, so
+   # the cards, filters and prompt never have to check
+   complete = df.notna().all(axis=1) & (
+       df.apply(lambda col: col.str.strip().str.lower()) != 'na'
+   ).fillna(False).all(axis=1)
+   df = df[complete].sort_values('Attorney').reset_index(drop=True)
+   
+   # Split expertise once here instead of on every filter and render
+   return df.assign(
+       _expertise_list=pd.Series(split_expertise(df['Summary and Expertise']).to_pylist(), index=df.index),
+       _search_text=build_search_text(df)
+   )
+
+def read_roster():
+   """Read the roster from its Parquet copy, rebuilding that from the CSV when stale"""
+   if os.path.exists(PARQUET_FILE) and os.path.getmtime(PARQUET_FILE) >= os.path.getmtime(DATA_FILE):
+       try:
+           return pd.read_parquet(PARQUET_FILE, columns=LAWYER_COLUMNS).astype(LAWYER_DTYPES)
+       except Exception:
+           pass  # Unreadable copy; rebuild it from the CSV below
+   
+   df = read_csv_data()
+   try:
+       df.to_parquet(PARQUET_FILE, compression='zstd', index=False)
+   except Exception as e:
+       # Logged rather than shown, as load_data's cache would replay a warning to every visitor
+       logging.warning(f"Could not write {PARQUET_FILE}, the CSV will be parsed on every start: {str(e)}")
+   return df
+
+def read_csv_data():
    """Load data with different encodings"""
    encodings_to_try = ['utf-8', 'latin1', 'iso-8859-1', 'cp1252']
    
+   # Read the file once and retry only the decoding
+   with open(DATA_FILE, 'rb') as f:
+       raw = f.read()
+   
    for encoding in encodings_to_try:
        try:
-           df = pd.read_csv('Cleaned_Matters_OGC.csv', encoding=encoding)
-           return df[['Attorney', 'Work Email', 'Education', 'Summary and Expertise']]
+           return pd.read_csv(io.BytesIO(raw), encoding=encoding, usecols=LAWYER_COLUMNS, dtype=LAWYER_DTYPES)[LAWYER_COLUMNS]
        except UnicodeDecodeError:
            continue
        except Exception as e:
@@ -19,153 +334,305 @@ def load_data():
    
    raise Exception("Could not read the CSV file with any of the attempted encodings")
 
+def build_search_text(lawyers_df):
+   """Build lowercase text to shortlist each lawyer by
+
+   This is the lawyer's expertise plus the areas KNOWN_EXPERTS lists them
+   under, matched on full name, so experts the guidelines vouch for are kept
+   even when their listed expertise doesn't use the client's wording.
+   """
+   vouched = {}
+   for area, known in KNOWN_EXPERTS.items():
+       for name, reason in known['experts']:
+           vouched.setdefault(name, []).append(f"{area} {reason}".lower())
+   
+   mentions = lawyers_df['Attorney'].fillna('').str.strip().map(lambda name: " ".join(vouched.get(name, [])))
+   return lawyers_df['Summary and Expertise'].fillna('').str.lower().str.cat(mentions, sep=" ")
+
+@st.cache_resource(show_spinner=False)
+def get_search_index(roster_key, _lawyers_df):
+   """Fit a TF-IDF index over each lawyer's search text, once per roster fingerprint"""
+   vectorizer = TfidfVectorizer(stop_words=sorted(ENGLISH_STOP_WORDS | QUERY_STOPWORDS), sublinear_tf=True)
+   return vectorizer, vectorizer.fit_transform(_lawyers_df['_search_text'])
+
+def shortlist_lawyers(query, lawyers_df, limit=ROSTER_LIMIT):
+   """Keep the lawyers whose search text is most similar to the query
+
+   Falls back to the full roster when nothing in the query matches, leaving
+   the judgement to Claude.
+   """
+   if len(lawyers_df) <= limit:
+       return lawyers_df
+   
+   vectorizer, matrix = get_search_index(get_roster_key(lawyers_df), lawyers_df)
+   # TF-IDF rows are L2 normalised, so the dot product is cosine similarity
+   similarity = (matrix @ vectorizer.transform([query]).T).toarray().ravel()
+   candidates = np.flatnonzero(similarity)
+   if candidates.size == 0:
+       return lawyers_df
+   if candidates.size > limit:
+       candidates = candidates[np.argpartition(-similarity[candidates], limit)[:limit]]
+   return lawyers_df.iloc[candidates[np.argsort(-similarity[candidates], kind='stable')]]
+
+def split_expertise(expertise):
+   """Split comma-separated expertise into lists of trimmed areas with Arrow kernels"""
+   return pc.split_pattern_regex(pc.utf8_trim_whitespace(pa.array(expertise.fillna(''))), r'\s*,\s*')
+
+def get_practice_areas(lawyers_df):
+   """Get the sorted list of practice areas across all lawyers"""
+   areas = pc.list_flatten(split_expertise(lawyers_df['Summary and Expertise']))
+   return sorted(pc.unique(pc.filter(areas, pc.not_equal(areas, ''))).to_pylist())
+
+@st.cache_data(show_spinner=False)
+def get_practice_index(roster_key, _lawyers_df):
+   """Map each lowercased practice area to the positions of the lawyers who list it
+
+   Keyed on the roster fingerprint, as hashing the whole frame on every call
+   costs more than building the index.
+   """
+   areas = _lawyers_df['_expertise_list'].reset_index(drop=True).explode().dropna()
+   areas = areas[areas != '']
+   positions = pd.Series(areas.index.to_numpy(), index=areas.str.lower().to_numpy())
+   return {area: np.unique(rows) for area, rows in positions.groupby(level=0)}
+
+def build_lawyer_cards(lawyers_df):
+   """Build the HTML card for each lawyer"""
+   def as_html(text):
+       return html.escape(text).replace('\n', '<br>')
+   
+   # Plain tuples avoid building a Series per lawyer
+   cards = []
+   card_rows = lawyers_df[['Attorney', 'Work Email', 'Education', '_expertise_list']].itertuples(index=False, name=None)
+   for attorney, email, education, areas in card_rows:
+       expertise_items = "".join(f"<li>{as_html(area)}</li>" for area in areas)
+       cards.append(
+           f"<details><summary>🧑‍⚖️ {as_html(attorney)}</summary>"
+           f"<p><strong>Contact:</strong><br>{as_html(email)}</p>"
+           f"<p><strong>Education:</strong><br>{as_html(education)}</p>"
+           f"<p><strong>Expertise:</strong></p><ul>{expertise_items}</ul></details>"
+       )
+   return cards
+
 def create_lawyer_cards(lawyers_df):
-   """Create card layout for lawyers"""
+   """Create card layout for lawyers
+
+   The cards are sent as one HTML block of <details> elements rather than one
+   expander widget per lawyer, CARDS_PER_PAGE at a time, which keeps rendering
+   cost flat as the roster grows.
+   """
    if lawyers_df.empty:
        st.warning("No lawyers match the selected filters.")
        return
        
    st.write("### 📊 Available Lawyers")
    
-   lawyers_df = lawyers_df.sort_values('Attorney')
-   cols = st.columns(3)
+   # Only one page of cards is built and sent to the browser per rerun
+   n_pages = max(1, math.ceil(len(lawyers_df) / CARDS_PER_PAGE))
+   page = 1
+   if n_pages > 1:
+       page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+   start = (page - 1) * CARDS_PER_PAGE
+   page_cards = build_lawyer_cards(lawyers_df.iloc[start:start + CARDS_PER_PAGE])
+   if n_pages > 1:
+       st.caption(f"Showing {start + 1}–{start + len(page_cards)} of {len(lawyers_df)} lawyers")
    
-   for idx, (_, lawyer) in enumerate(lawyers_df.iterrows()):
-       # Skip if essential information is NA or empty
-       if (pd.isna(lawyer['Attorney']) or 
-           pd.isna(lawyer['Work Email']) or 
-           pd.isna(lawyer['Education']) or 
-           pd.isna(lawyer['Summary and Expertise']) or
-           lawyer['Attorney'].strip().lower() == 'na' or
-           lawyer['Work Email'].strip().lower() == 'na' or
-           lawyer['Education'].strip().lower() == 'na' or
-           lawyer['Summary and Expertise'].strip().lower() == 'na'):
-           continue
-           
-       with cols[idx % 3]:
-           with st.expander(f"🧑‍⚖️ {lawyer['Attorney']}", expanded=False):
-               expertise_bullets = [f"• {area.strip()}" for area in str(lawyer['Summary and Expertise']).split(',')]
-               expertise_text = "\n".join(expertise_bullets)
-               
-               content = f"""
-**Contact:**
-{lawyer['Work Email']}
+   st.markdown(
+       f"{CARD_STYLE}<div class=\"lawyer-cards\">{''.join(page_cards)}</div>",
+       unsafe_allow_html=True
+   )
 
-**Education:**
-{lawyer['Education']}
+@st.cache_resource
+def get_anthropic_client():
+   """Create one Anthropic client per process so its connection pool is reused"""
+   return anthropic.Anthropic(api_key=st.secrets["ANTHROPIC_API_KEY"])
 
-**Expertise:**
-{expertise_text}
-"""
-               st.markdown(content)
+@st.cache_resource
+def get_response_cache():
+   """Process-wide store of Claude's matches, keyed on query and roster"""
+   return {}
 
-def get_claude_response(query, lawyers_df):
-   """Get Claude's analysis of the best lawyer matches with domain knowledge"""
-   try:
-       # Initialize client with Streamlit secret
-       client = anthropic.Anthropic(api_key=st.secrets["ANTHROPIC_API_KEY"])
-       
-       summary_text = "Available Lawyers and Their Expertise:\n\n"
-       for _, lawyer in lawyers_df.iterrows():
-           summary_text += f"- {lawyer['Attorney']}\n"
-           summary_text += f"  Education: {str(lawyer['Education'])}\n"
-           summary_text += f"  Expertise: {str(lawyer['Summary and Expertise'])}\n\n"
+def get_roster_key(lawyers_df):
+   """Fingerprint the roster so cached matches are not reused once it changes"""
+   hashed = pd.util.hash_pandas_object(lawyers_df[['Attorney', 'Summary and Expertise']], index=False)
+   return hashlib.md5(hashed.values.tobytes()).hexdigest()
 
-       system_prompt = "You are a legal staffing specialist helping to match lawyers with client needs."
-       
-       message = client.messages.create(
-           model="claude-3-sonnet-20240229",
-           system=system_prompt,
-           temperature=0.1,
-           max_tokens=1500,
-           messages=[{
-               "role": "user", 
-               "content": f"""Client Need: {query}
-
-{summary_text}
-
-Please analyze the lawyers' profiles and recommend matches based on these important guidelines:
-
-1. For employment law queries:
-  - Patricia Lantzy, Margaret Scheele, Sarah Biran, and Lorna Hebert are the key employment attorneys
-  - Note that no employment lawyer works more than 85 hours per month
-
-2. For corporate formation:
-  - Key experts include Kristin Kreuder, Michael Mendelson, Bruce Friedman, Leonard McGill, Nicole Desharnais, Chandana Rao, Caroline McCaffrey
-  - Susan Antonio has expertise but limited availability
-
-3. For trademark work:
-  - Primary experts are Wade Savoy, Michelle Roseberg, and Jessica Davis
-
-4. For HIPAA and BAAs:
-  - Core experts are Holly Little, Bob Michitarian, Mark Feingold, Michael Brown, Marty Lipman
-  - Fritz Backus and Raymond Sczudlo have limited HIPAA experience
-  - Brian Heller should be noted as having NO HIPAA experience
-
-5. For specialized areas:
-  - FDA/Pharma: Mark Mansour (primary), Berry Cappucci, Jordan Karp, Holly Little, Elizabeth Smith (limited)
-  - Data Privacy: Caroline McCaffrey, Mark Johnson, Lori Ross, Stephan Grynwajc, Lakshmi Ramani
-  - Real Estate: Josh Miller, James Duberman, Michael Plantamura
-  - Social Media/Influencer: Stacey Heller, Chandana Rao, Joseph Tedeschi, Bruce Friedman, Ted Stern, Brad Auerbach
-  - Satellite/Aerospace: Michael Mendelson, Don Levy, Donnellda Rice, Ron Jarvis
-  - DAFs: Anita Drummond, Lakshmi Ramani
-  - Content/Media Licensing: Ted Stern, Brian Heller, Joseph Tedeschi, Chandana Rao, Andy Friedman
-  - Commercial Real Estate: Josh Miller, James Duberman, Michael Plantamura
-  - Equity Compensation: Nicole Desharnais, Leonard McGill, Don Levy
-  - Retail Industry: Stacey Heller (big box), Billie Audia Munro (big box), Chandana Rao (fashion)
-
-Please provide matches in this exact format:
-
-MATCH_START
-Rank: 1
-Name: [Attorney Name]
-Key Expertise: [Relevant expertise for this query]
-Recommendation Reason: [Why this lawyer is appropriate, including any caveats or limitations]
-MATCH_END"""
-           }]
+def show_matches(placeholder, results_df):
+   """Render the match table into a placeholder, replacing what was there"""
+   with placeholder.container():
+       st.markdown("### 🎯 Top Lawyer Matches")
+       st.dataframe(
+           results_df,
+           hide_index=True,
+           use_container_width=True,
+           height=400
        )
+
+def build_lawyer_summary(lawyers_df):
+   """Render the roster text Claude matches against"""
+   entries = [
+       f"- {name}\n  Education: {education}\n  Expertise: {expertise}\n\n"
+       for name, education, expertise in lawyers_df[['Attorney', 'Education', 'Summary and Expertise']].itertuples(index=False, name=None)
+   ]
+   return "Available Lawyers and Their Expertise:\n\n" + "".join(entries)
+
+def build_match_request(query, lawyers_df, model):
+   """Build the Messages API arguments for matching a query against the roster"""
+   summary_text = build_lawyer_summary(shortlist_lawyers(query, lawyers_df))
+   
+   # Shortlisting trades away most prompt caching: the roster now differs per
+   # query, and the fixed part before it is shorter than the minimum Anthropic
+   # will cache. The breakpoint only pays off when the whole roster is sent,
+   # i.e. when nothing in the query matched and the shortlist fell back to it.
+   system_blocks = [
+       {"type": "text", "text": SYSTEM_PROMPT},
+       {"type": "text", "text": MATCHING_GUIDELINES},
+       {"type": "text", "text": summary_text, "cache_control": {"type": "ephemeral"}}
+   ]
+   
+   return {
+       "model": model,
+       "system": system_blocks,
+       "tools": [MATCHES_TOOL],
+       "tool_choice": {"type": "tool", "name": MATCHES_TOOL["name"]},
+       "temperature": 0.1,
+       "max_tokens": MAX_TOKENS,
+       "messages": [{
+           "role": "user", 
+           "content": f"Client Need: {query}"
+       }]
+   }
+
+def get_match_cache_key(query, lawyers_df, model):
+   """Key a search on its normalised query, the roster it ran against and the model"""
+   return (" ".join(query.lower().split()), get_roster_key(lawyers_df), model)
+
+def store_matches(cache_key, results_df):
+   """Cache a successful search, dropping expired entries while we're here"""
+   response_cache = get_response_cache()
+   now = time.time()
+   # Other sessions write to the same dict, so sweep a snapshot of it
+   for key, (stored_at, _) in list(response_cache.items()):
+       if now - stored_at >= RESPONSE_CACHE_TTL:
+           response_cache.pop(key, None)
+   response_cache[cache_key] = (now, results_df)
+
+def get_claude_response(query, lawyers_df, placeholder=None, model=MODEL):
+   """Get Claude's analysis of the best lawyer matches with domain knowledge
+
+   When a placeholder is given, matches are rendered into it as they stream in.
+   Successful results are reused for RESPONSE_CACHE_TTL seconds for the same
+   query against the same roster.
+   """
+   cache_key = get_match_cache_key(query, lawyers_df, model)
+   cached = get_response_cache().get(cache_key)
+   if cached is not None and time.time() - cached[0] < RESPONSE_CACHE_TTL:
+       return cached[1]
+   
+   try:
+       client = get_anthropic_client()
+       
+       # Stream so completed matches can be shown while the rest are generated
+       shown_matches = 0
+       with client.messages.stream(**build_match_request(query, lawyers_df, model)) as stream:
+           for event in stream:
+               if event.type != 'input_json' or placeholder is None:
+                   continue
+               # The last match in the snapshot may still be half written
+               completed_matches = event.snapshot.get('matches', [])[:-1]
+               if len(completed_matches) > shown_matches:
+                   shown_matches = len(completed_matches)
+                   show_matches(placeholder, parse_claude_response(completed_matches))
+           message = stream.get_final_message()
        
-       # Extract the content from the first message
-       response_text = message.content[0].text
-       return parse_claude_response(response_text)
+       st.session_state.last_usage = message.usage.to_dict()
+       matches = get_tool_matches(message)
+       truncated = message.stop_reason == 'max_tokens'
+       if truncated:
+           # The answer was cut off, so the last match may be half written
+           matches = matches[:-1]
+       results_df = parse_claude_response(matches)
 
    except Exception as e:
+       if placeholder is not None:
+           # Don't leave matches from a failed stream on screen
+           placeholder.empty()
        st.error("Error getting recommendations")
        st.sidebar.error(f"API Error Details: {str(e)}")
        st.sidebar.error(f"Error Type: {type(e)}")
        return None
+   
+   # Stored outside the try so a caching problem is never reported as a failed API call
+   if not results_df.empty and not truncated:
+       store_matches(cache_key, results_df)
+   return results_df
+
+def get_tool_matches(message):
+   """Pull the list of matches out of Claude's return_matches tool call"""
+   tool_use = next(block for block in message.content if block.type == 'tool_use')
+   return tool_use.input.get('matches', [])
+
+def parse_claude_response(matches):
+   """Parse the matches from Claude's tool call into a structured format"""
+   df = pd.DataFrame(matches, columns=list(MATCH_COLUMNS)).rename(columns=MATCH_COLUMNS)
+   return df.sort_values('Rank')
+
+def match_known_area(query):
+   """Get the KNOWN_EXPERTS area a query asks about and nothing else, if any"""
+   areas = [area for area, known in KNOWN_EXPERTS.items() if known['pattern'].search(query)]
+   if len(areas) != 1:
+       return None
+   
+   rest = re.findall(r"[a-z0-9]+", KNOWN_EXPERTS[areas[0]]['pattern'].sub(" ", query.lower()))
+   if any(word not in AREA_FILLER_WORDS for word in rest):
+       return None
+   return areas[0]
 
-def parse_claude_response(response):
-   """Parse Claude's response into a structured format"""
-   matches = []
-   for match in response.split('MATCH_START')[1:]:
-       match_data = {}
-       lines = match.split('MATCH_END')[0].strip().split('\n')
-       
-       for line in lines:
-           if ':' in line:
-               key, value = line.split(':', 1)
-               match_data[key.strip()] = value.strip()
-       
-       if match_data:
-           matches.append(match_data)
+def check_area_routing():
+   """Fail fast if an edit to KNOWN_EXPERTS or AREA_FILLER_WORDS changes which queries skip Claude"""
+   for query in EXAMPLE_QUERIES:
+       assert match_known_area(query) is not None, f"Example is no longer answered from KNOWN_EXPERTS: {query}"
+   for query in CLAUDE_ONLY_QUERIES:
+       assert match_known_area(query) is None, f"Query would skip Claude: {query}"
+
+def lookup_known_experts(query, lawyers_df):
+   """Answer a query that asks about nothing but one practice area without calling Claude
+
+   Returns None when the query names no area or several, says anything more
+   than the area, or when none of the area's experts are on this roster, so
+   the caller can ask Claude instead.
+   """
+   area = match_known_area(query)
+   if area is None:
+       return None
    
-   df = pd.DataFrame(matches)
-   if not df.empty:
-       desired_columns = ['Rank', 'Name', 'Key Expertise', 'Recommendation Reason']
-       existing_columns = [col for col in desired_columns if col in df.columns]
-       df = df[existing_columns]
-       if 'Rank' in df.columns:
-           df['Rank'] = pd.to_numeric(df['Rank'])
-           df = df.sort_values('Rank')
+   known = KNOWN_EXPERTS[area]
+   on_roster = set(lawyers_df['Attorney'].str.strip())
+   experts = [(name, reason) for name, reason in known['experts'] if name in on_roster]
+   if not experts:
+       return None
    
-   return df
+   caveat = f"; {known['caveat']}" if 'caveat' in known else ""
+   return parse_claude_response([
+       {'rank': rank, 'name': name, 'key_expertise': area, 'reason': reason + caveat}
+       for rank, (name, reason) in enumerate(experts, start=1)
+   ])
+
+def get_configured_model():
+   """Get the model named by CLAUDE_MODEL in Streamlit secrets, else the default"""
+   try:
+       return st.secrets.get("CLAUDE_MODEL", MODEL)
+   except FileNotFoundError:
+       return MODEL
+
+def set_query(query):
+   """Button callback that fills in the search box"""
+   st.session_state.query = query
 
 def main():
    st.title("🧑‍⚖️ Outside GC Lawyer Matcher")
    
    try:
-       lawyers_df = load_data()
+       lawyers_df = load_data(os.path.getmtime(DATA_FILE))
        if lawyers_df is None:
            st.error("Failed to load lawyer data.")
            return
@@ -175,14 +642,12 @@ def main():
            st.sidebar.write("Data Shape:", lawyers_df.shape)
            st.sidebar.write("Columns:", list(lawyers_df.columns))
            st.sidebar.write("Sample Data:", lawyers_df.head())
+           if 'last_usage' in st.session_state:
+               st.sidebar.write("Last API Usage:", st.session_state.last_usage)
        
        st.sidebar.title("Filters")
        
-       # Get practice areas
-       practice_areas = []
-       for expertise in lawyers_df['Summary and Expertise'].dropna():
-           practice_areas.extend([area.strip() for area in str(expertise).split(',')])
-       practice_areas = sorted(list(set(practice_areas)))
+       practice_areas = get_practice_areas(lawyers_df)
        
        # Practice area filter
        selected_practice_area = st.sidebar.selectbox(
@@ -190,55 +655,38 @@ def main():
            ["All"] + practice_areas
        )
        
-       st.write("### How can we help you find the right lawyer?")
+       use_sonnet = st.sidebar.checkbox("Use Sonnet (slower, for comparing match quality)")
+       model = SONNET_MODEL if use_sonnet else get_configured_model()
        
-       # Example queries based on common requests
-       examples = [
-           "Show me an available employment attorney",
-           "Who can help with HIPAA and BAAs?",
-           "I need a lawyer for trademark work",
-           "Looking for someone with FDA and pharmaceutical experience",
-           "Need help with data privacy and cybersecurity",
-           "Who can help with social media and influencer agreements?",
-           "Looking for a commercial real estate lawyer",
-           "Need help with equity compensation plans"
-       ]
+       st.write("### How can we help you find the right lawyer?")
        
-       # Example query buttons
+       # Example query buttons fill in the search box from a callback, which runs
+       # before the button's own rerun, so no second rerun is needed
        col1, col2 = st.columns(2)
-       for i, example in enumerate(examples):
-           if i % 2 == 0:
-               if col1.button(f"🔍 {example}"):
-                   st.session_state.query = example
-                   st.experimental_rerun()
-           else:
-               if col2.button(f"🔍 {example}"):
-                   st.session_state.query = example
-                   st.experimental_rerun()
+       for i, example in enumerate(EXAMPLE_QUERIES):
+           col = col1 if i % 2 == 0 else col2
+           col.button(f"🔍 {example}", on_click=set_query, args=(example,))
 
        # Filter lawyers based on selection
-       filtered_df = lawyers_df.copy()
+       # Nothing downstream mutates the frame, so the unfiltered roster is used as is
+       filtered_df = lawyers_df
        if selected_practice_area != "All":
-           filtered_df = filtered_df[
-               filtered_df['Summary and Expertise'].str.contains(str(selected_practice_area), na=False, case=False)
-           ]
+           practice_index = get_practice_index(get_roster_key(lawyers_df), lawyers_df)
+           filtered_df = lawyers_df.iloc[practice_index[selected_practice_area.lower()]]
        
-       # Custom query input
-       query = st.text_area(
-           "Describe what you're looking for:",
-           value=st.session_state.get('query', ''),
-           placeholder="Example: I need an employment lawyer with retail industry experience...",
-           height=100
-       )
+       # Custom query input, in a form so typing doesn't rerun the app
+       with st.form("search"):
+           query = st.text_area(
+               "Describe what you're looking for:",
+               key='query',
+               placeholder="Example: I need an employment lawyer with retail industry experience...",
+               height=100
+           )
 
-       # Search and Clear buttons
-       col1, col2 = st.columns([1, 4])
-       search = col1.button("🔎 Search")
-       clear = col2.button("Clear")
-
-       if clear:
-           st.session_state.query = ''
-           st.experimental_rerun()
+           # Search and Clear buttons
+           col1, col2 = st.columns([1, 4])
+           search = col1.form_submit_button("🔎 Search")
+           col2.form_submit_button("Clear", on_click=set_query, args=('',))
 
        # Show counts
        st.sidebar.markdown("---")
@@ -246,23 +694,20 @@ def main():
        
        # Show recommendations or all lawyers
        if search and query:
-           with st.spinner("Finding the best matches..."):
-               results_df = get_claude_response(query, filtered_df)
-               if results_df is not None and not results_df.empty:
-                   st.markdown("### 🎯 Top Lawyer Matches")
-                   # Updated dataframe display with custom height
-                   st.dataframe(
-                       results_df,
-                       hide_index=True,
-                       use_container_width=True,
-                       height=400  # Increased height in pixels
-                   )
-                   
-                   # Add disclaimer
-                   st.info("""
-                   ℹ️ These recommendations are based on known expertise and availability. 
-                   Please confirm specific details and availability with the lawyers directly.
-                   """)
+           results_placeholder = st.empty()
+           # Sonnet is there to compare Claude's own matching, so it always asks Claude
+           results_df = None if use_sonnet else lookup_known_experts(query, filtered_df)
+           if results_df is None:
+               with st.spinner("Finding the best matches..."):
+                   results_df = get_claude_response(query, filtered_df, results_placeholder, model)
+           if results_df is not None and not results_df.empty:
+               show_matches(results_placeholder, results_df)
+               
+               # Add disclaimer
+               st.info("""
+               ℹ️ These recommendations are based on known expertise and availability. 
+               Please confirm specific details and availability with the lawyers directly.
+               """)
        else:
            create_lawyer_cards(filtered_df)
            
@@ -273,5 +718,7 @@ def main():
        if st.sidebar.checkbox("Show Debug Info"):
            st.sidebar.error(f"Error details: {str(e)}")
 
+check_area_routing()
+
 if __name__ == "__main__":
    main()